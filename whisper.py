@@ -9,15 +9,21 @@ Usage:
 """
 
 import os
+import io
 import time
+import asyncio
 import signal
+import struct
 import tempfile
 import subprocess
 import threading
 import logging
+import hashlib
+import importlib.util
 import sys
 from pathlib import Path
-from datetime import datetime
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 
 # Set up logging
 logging.basicConfig(
@@ -33,14 +39,39 @@ try:
     from pynput import keyboard
     from dotenv import load_dotenv
     import sounddevice as sd
-    import soundfile as sf
     import numpy as np
 except ImportError as e:
-    logger.error(f"Failed to import required dependency: {e}")
+    logger.error("Failed to import required dependency: %s", e)
     print("Please ensure all dependencies are installed:")
-    print("pip install openai pyperclip pynput python-dotenv sounddevice soundfile numpy setuptools")
+    print("pip install openai pyperclip pynput python-dotenv sounddevice soundfile numpy")
     sys.exit(1)
 
+# soundfile is only needed for Opus encoding; WAV is written directly
+try:
+    import soundfile as sf
+except ImportError:
+    sf = None
+
+# Quartz (PyObjC) posts Cmd+V directly; without it we fall back to osascript
+try:
+    from Quartz import (
+        CGEventCreateKeyboardEvent,
+        CGEventPost,
+        CGEventSetFlags,
+        kCGEventFlagMaskCommand,
+        kCGHIDEventTap,
+    )
+    QUARTZ_AVAILABLE = True
+except ImportError:
+    QUARTZ_AVAILABLE = False
+
+# faster-whisper transcribes short clips locally when installed
+try:
+    from faster_whisper import WhisperModel
+    LOCAL_WHISPER_AVAILABLE = True
+except ImportError:
+    LOCAL_WHISPER_AVAILABLE = False
+
 # Load environment variables from .env file
 load_dotenv()
 
@@ -53,21 +84,10 @@ if not openai_api_key:
 
 # Initialize OpenAI with version detection
 try:
-    try:
-        # Try to use pkg_resources if available
-        import pkg_resources
-        import openai
-        openai_version = pkg_resources.get_distribution("openai").version
-        logger.info(f"Detected OpenAI package version: {openai_version}")
-    except ImportError:
-        # Fall back to directly checking the module
-        import openai
-        try:
-            openai_version = openai.__version__
-            logger.info(f"Detected OpenAI version from attribute: {openai_version}")
-        except AttributeError:
-            openai_version = "unknown"
-            logger.warning("Could not determine OpenAI version, assuming legacy")
+    import openai
+    # Packages too old to report a version are treated as legacy
+    openai_version = getattr(openai, "__version__", "0.0")
+    logger.info("Detected OpenAI version: %s", openai_version)
     
     # Handle different OpenAI API versions
     if str(openai_version).startswith("0."):
@@ -78,12 +98,20 @@ try:
     else:
         # Modern OpenAI API (v1.x+)
         logger.info("Using OpenAI modern API (v1.x+)")
-        from openai import OpenAI
-        client = OpenAI(api_key=openai_api_key)
+        import httpx
+        from openai import AsyncOpenAI, DefaultAsyncHttpxClient
+        # Keep idle connections for longer so requests a few minutes apart can reuse
+        # the TLS session; HTTP/2 multiplexes parallel chunk uploads when h2 is
+        # installed. Everything else, including timeouts, stays at the SDK defaults.
+        http_client = DefaultAsyncHttpxClient(
+            http2=importlib.util.find_spec("h2") is not None,
+            limits=httpx.Limits(max_connections=10, keepalive_expiry=300)
+        )
+        client = AsyncOpenAI(api_key=openai_api_key, http_client=http_client)
         OPENAI_LEGACY = False
 except Exception as e:
     # Fall back to legacy as default if detection fails
-    logger.warning(f"Error detecting OpenAI version: {e}")
+    logger.warning("Error detecting OpenAI version: %s", e)
     logger.info("Falling back to legacy OpenAI API")
     import openai
     openai.api_key = openai_api_key
@@ -93,135 +121,566 @@ except Exception as e:
 SAMPLE_RATE = 16000  # Hz
 MAX_RECORDING_SECONDS = 30
 TRANSCRIPTION_MODEL = "gpt-4o-transcribe"
+MAX_CONCURRENT_TRANSCRIPTIONS = 5
+TRANSCRIPT_CACHE_SIZE = 256
+V_KEY_VIRTUAL_CODE = 9  # macOS virtual key code for 'v'
+# Streamed text is pasted once a sentence of at least this many characters completes
+STREAM_PASTE_MIN_CHARS = 16
+# Cmd+V is only queued when posted; give the target app time to read the clipboard
+# before it is overwritten with the next segment
+PASTE_SETTLE_SECONDS = 0.15
+SENTENCE_ENDINGS = ('.', '!', '?')
+# Recordings longer than this are split at pauses into chunks of at least CHUNK_MIN_SECONDS
+CHUNKING_MIN_SECONDS = 15
+CHUNK_MIN_SECONDS = 5
+# Clips shorter than this go to the local model, since the API round-trip dominates
+LOCAL_MAX_SECONDS = 3.0
+LOCAL_MODEL_NAME = "tiny.en"
+
+# Opus needs libsndfile >= 1.0.29; fall back to WAV uploads without it
+try:
+    OPUS_AVAILABLE = sf is not None and 'OPUS' in sf.available_subtypes('OGG')
+except Exception:
+    OPUS_AVAILABLE = False
+if not OPUS_AVAILABLE:
+    logger.info("Opus encoding unavailable, uploading WAV audio")
+
+# 44-byte RIFF header for mono 16-bit PCM; the two size fields are patched per recording
+WAV_HEADER_TEMPLATE = struct.pack(
+    '<4sI4s4sIHHIIHH4sI',
+    b'RIFF', 0, b'WAVE',
+    b'fmt ', 16, 1, 1, SAMPLE_RATE, SAMPLE_RATE * 2, 2, 16,
+    b'data', 0
+)
 
 # Global variables
 recording = False
-audio_data = []
+stop_event = threading.Event()
+# Two preallocated int16 PCM buffers for the longest allowed recording. Recordings
+# alternate between them so a callback still finishing the previous recording never
+# writes into the new one. active_capture pairs the buffer with a one-element list
+# holding that recording's write position; each recording gets a fresh list, so a
+# late callback can only advance the old recording's position and no lock is needed.
+pcm_buffers = (
+    np.empty((SAMPLE_RATE * MAX_RECORDING_SECONDS, 1), dtype=np.int16),
+    np.empty((SAMPLE_RATE * MAX_RECORDING_SECONDS, 1), dtype=np.int16),
+)
+active_capture = (pcm_buffers[0], [0])
 recording_thread = None
+audio_stream = None
+audio_device_name = None
+audio_stream_lock = threading.Lock()
+transcription_loop = None
+transcription_queue = None
+# A single worker keeps pastes in order without blocking the transcription loop
+paste_pool = ThreadPoolExecutor(max_workers=1)
+local_model = None
 cache_dir = Path("~/Library/Caches/voice-paste").expanduser()
+# In-memory LRU of audio hash -> transcript, mirrored to text files in cache_dir
+transcript_cache = OrderedDict()
+transcript_cache_lock = threading.Lock()
+
+# Hotkey definition; every form of V is mapped to one KeyCode before it reaches pynput's HotKey
+HOTKEY = '<cmd>+<alt>+v'
+HOTKEY_MODIFIERS = frozenset((
+    keyboard.Key.cmd, keyboard.Key.cmd_l, keyboard.Key.cmd_r,
+    keyboard.Key.alt, keyboard.Key.alt_l, keyboard.Key.alt_r,
+))
+V_KEYCODES = (keyboard.KeyCode.from_char('v'), keyboard.KeyCode.from_char('V'))
+V_CHARS = frozenset(('v', 'V', '√', '◊'))
+
+
+def audio_callback(indata, frames, time_info, status):
+    """Callback for audio stream to copy recorded data into the buffer."""
+    if status:
+        logger.warning("Audio status: %s", status)
+    if recording:
+        buffer, position = active_capture
+        idx = position[0]
+        # Copy straight into place; clip to the end of the buffer, the recording stops shortly after
+        n = min(len(indata), len(buffer) - idx)
+        buffer[idx:idx + n] = indata[:n]
+        position[0] = idx + n
+
+
+def open_audio_stream():
+    """Open the microphone stream on the default input; the callback ignores audio unless recording."""
+    global audio_stream, audio_device_name
+    
+    audio_stream = sd.InputStream(samplerate=SAMPLE_RATE, channels=1, dtype='int16', callback=audio_callback)
+    audio_stream.start()
+    audio_device_name = sd.query_devices(audio_stream.device)['name']
+    logger.info("Listening on input device: %s", audio_device_name)
 
 
-def ensure_cache_dir():
-    """Ensure cache directory exists."""
-    cache_dir.mkdir(parents=True, exist_ok=True)
-    return cache_dir
+def reopen_audio_stream():
+    """Close a stream that has stopped and open a new one on the default input device."""
+    global audio_stream
+    
+    if audio_stream is not None:
+        audio_stream.close()
+        audio_stream = None
+    open_audio_stream()
 
 
-def record_audio():
+def record_audio(capture):
     """Record audio from microphone while hotkey is held."""
-    global recording, audio_data
-    
-    audio_data = []  # Reset audio data
-    
-    def audio_callback(indata, frames, time_info, status):
-        """Callback for audio stream to collect recorded data."""
-        if status:
-            logger.warning(f"Audio status: {status}")
-        if recording:
-            audio_data.append(indata.copy())
+    global recording
     
-    # Set up the audio stream
+    pcm = None
     try:
-        with sd.InputStream(samplerate=SAMPLE_RATE, channels=1, callback=audio_callback):
-            start_time = time.time()
-            logger.info("Recording started...")
-            
-            while recording and (time.time() - start_time) < MAX_RECORDING_SECONDS:
-                time.sleep(0.1)  # Sleep to reduce CPU usage
-                
-            elapsed = time.time() - start_time
-            if elapsed >= MAX_RECORDING_SECONDS:
-                logger.info(f"Maximum recording time reached ({MAX_RECORDING_SECONDS}s)")
-            
-            logger.info(f"Recording stopped after {elapsed:.2f}s")
-    except Exception as e:
-        logger.error(f"Error in audio recording: {str(e)}")
+        # A stream whose device went away stops; reopen it before recording
+        with audio_stream_lock:
+            if audio_stream is None or not audio_stream.active:
+                logger.warning("Audio stream is not running, reopening it")
+                try:
+                    reopen_audio_stream()
+                except Exception as e:
+                    logger.error("Error opening audio stream, cannot record: %s", e)
+                    return
+        
+        start_time = time.time()
+        logger.info("Recording started...")
+        
+        # Block until the hotkey is released or the time limit is hit
+        if not stop_event.wait(timeout=MAX_RECORDING_SECONDS):
+            logger.info("Maximum recording time reached (%ss)", MAX_RECORDING_SECONDS)
+        
+        # Copy the recorded slice out before capture stops, so the buffer is free for
+        # reuse while this audio is hashed and encoded; a callback still in flight
+        # only writes past the end of the copied slice
+        buffer, position = capture
+        pcm = buffer[:position[0]].copy()
+        elapsed = time.time() - start_time
+        logger.info("Recording stopped after %.2fs", elapsed)
+    finally:
+        recording = False
     
-    if audio_data:
-        logger.info(f"Recorded {len(audio_data)} audio chunks, processing...")
-        process_audio()
+    if pcm is not None and len(pcm):
+        logger.info("Recorded %s audio frames, processing...", len(pcm))
+        process_audio(pcm)
     else:
         logger.warning("No audio data captured during recording")
 
 
-def process_audio():
-    """Save recorded audio to file and send to OpenAI for transcription."""
-    if not audio_data:
-        logger.warning("No audio recorded")
+def process_audio(pcm):
+    """Encode recorded audio in memory and send to OpenAI for transcription."""
+    try:
+        # Leading and trailing silence only costs upload time
+        trimmed = trim_silence(pcm, SAMPLE_RATE)
+        if len(trimmed) < len(pcm):
+            logger.info("Trimmed %.2fs of silence", (len(pcm) - len(trimmed)) / SAMPLE_RATE)
+            pcm = trimmed
+        
+        cache_key = hashlib.blake2b(pcm, digest_size=16).hexdigest()
+        cached_text = get_cached_transcript(cache_key)
+        if cached_text is not None:
+            logger.info("Transcription cache hit: %s...", cached_text[:50])
+            # Still queued so it pastes after any earlier recording
+            transcribe_audio([], None, cached_text=cached_text)
+            return
+        
+        # Long recordings are split at pauses so the chunks can be transcribed in parallel
+        if len(pcm) > CHUNKING_MIN_SECONDS * SAMPLE_RATE:
+            chunks = split_on_silence(pcm, SAMPLE_RATE)
+        else:
+            chunks = [pcm]
+        # Encode the recorded slices without touching disk
+        audio_buffers = [encode_audio(chunk) for chunk in chunks]
+        # faster-whisper expects mono float32 in [-1, 1]
+        if local_model is not None and len(pcm) < LOCAL_MAX_SECONDS * SAMPLE_RATE:
+            local_audio = pcm.reshape(-1).astype(np.float32) / 32768.0
+        else:
+            local_audio = None
+        
+        encoded_bytes = sum(buffer.getbuffer().nbytes for buffer in audio_buffers)
+        logger.info("Audio encoded: %s bytes in %s chunk(s)", encoded_bytes, len(audio_buffers))
+        
+        # Queue audio for transcription
+        transcribe_audio(audio_buffers, cache_key, local_audio)
+        
+    except Exception as e:
+        logger.error("Error processing audio: %s", e)
+
+
+def frame_levels(pcm, frame_length):
+    """Return the mean absolute amplitude of each whole frame of PCM."""
+    frame_count = len(pcm) // frame_length
+    frames = pcm[:frame_count * frame_length].reshape(frame_count, frame_length)
+    # Widen first so abs(-32768) does not overflow int16
+    return np.abs(frames.astype(np.int32)).mean(axis=1)
+
+
+def trim_silence(pcm, sample_rate, min_trim_ms=200, pad_ms=150, relative_threshold=0.05,
+                 min_voiced_frames=3):
+    """Drop leading and trailing silence, only trimming an end that has more than min_trim_ms."""
+    frame_length = sample_rate // 50  # 20 ms frames
+    levels = frame_levels(pcm, frame_length)
+    if len(levels) == 0:
+        return pcm
+    
+    voiced = np.flatnonzero(levels > levels.max() * relative_threshold)
+    # A key click in an otherwise silent clip is not speech worth trimming to
+    if len(voiced) < min_voiced_frames:
+        return pcm
+    
+    # Keep a margin either side; soft word edges (a trailing "s", a breathy "h")
+    # sit well below the threshold set by the loudest vowel
+    pad_frames = pad_ms // 20
+    first_frame = max(voiced[0] - pad_frames, 0)
+    last_frame = min(voiced[-1] + pad_frames, len(levels) - 1)
+    
+    min_trim_frames = min_trim_ms // 20
+    start = first_frame * frame_length if first_frame > min_trim_frames else 0
+    trailing_frames = len(levels) - 1 - last_frame
+    end = (last_frame + 1) * frame_length if trailing_frames > min_trim_frames else len(pcm)
+    return pcm[start:end]
+
+
+def split_on_silence(pcm, sample_rate, min_silence_ms=400, threshold=200):
+    """Split PCM at pauses, placing cuts at least CHUNK_MIN_SECONDS apart."""
+    frame_length = sample_rate // 50  # 20 ms frames
+    levels = frame_levels(pcm, frame_length)
+    if len(levels) == 0:
+        return [pcm]
+    silent = levels < threshold
+    
+    min_silence_frames = min_silence_ms // 20
+    min_chunk_frames = CHUNK_MIN_SECONDS * 50
+    cuts = []
+    last_cut = 0
+    silence_start = None
+    for index, is_silent in enumerate(silent):
+        if is_silent:
+            if silence_start is None:
+                silence_start = index
+            continue
+        if silence_start is not None and index - silence_start >= min_silence_frames:
+            # Cut in the middle of the pause
+            cut = (silence_start + index) // 2
+            if cut - last_cut >= min_chunk_frames:
+                cuts.append(cut * frame_length)
+                last_cut = cut
+        silence_start = None
+    
+    return np.split(pcm, cuts)
+
+
+def encode_audio(pcm):
+    """Encode PCM samples into a named in-memory file, preferring Ogg/Opus."""
+    if OPUS_AVAILABLE:
+        try:
+            audio_buffer = io.BytesIO()
+            sf.write(audio_buffer, pcm, SAMPLE_RATE, format='OGG', subtype='OPUS')
+            audio_buffer.seek(0)
+            # The OpenAI SDK uses the name to infer the audio format
+            audio_buffer.name = "audio.ogg"
+            return audio_buffer
+        except Exception as e:
+            logger.warning("Opus encoding failed, falling back to WAV: %s", e)
+    
+    # Mono int16 PCM needs only a fixed header in front of the raw samples
+    header = bytearray(WAV_HEADER_TEMPLATE)
+    struct.pack_into('<I', header, 4, 36 + pcm.nbytes)
+    struct.pack_into('<I', header, 40, pcm.nbytes)
+    audio_buffer = io.BytesIO()
+    audio_buffer.write(header)
+    audio_buffer.write(pcm.data)
+    audio_buffer.seek(0)
+    audio_buffer.name = "audio.wav"
+    return audio_buffer
+
+
+def prune_transcript_cache():
+    """Create the cache directory and evict the oldest transcripts beyond the cap."""
+    try:
+        cache_dir.mkdir(parents=True, exist_ok=True)
+        cache_files = sorted(cache_dir.glob("*.txt"), key=lambda f: f.stat().st_mtime, reverse=True)
+        for cache_file in cache_files[TRANSCRIPT_CACHE_SIZE:]:
+            cache_file.unlink()
+        if len(cache_files) > TRANSCRIPT_CACHE_SIZE:
+            logger.info("Evicted %s cached transcripts", len(cache_files) - TRANSCRIPT_CACHE_SIZE)
+    except OSError as e:
+        logger.error("Error pruning transcript cache: %s", e)
+
+
+def get_cached_transcript(cache_key):
+    """Return the cached transcript for an audio hash, or None."""
+    with transcript_cache_lock:
+        if cache_key in transcript_cache:
+            transcript_cache.move_to_end(cache_key)
+            return transcript_cache[cache_key]
+    
+    cache_file = cache_dir / f"{cache_key}.txt"
+    try:
+        text = cache_file.read_text()
+        # Refresh the mtime so disk eviction is least-recently-used
+        os.utime(cache_file)
+    except OSError:
+        return None
+    
+    store_in_memory_cache(cache_key, text)
+    return text
+
+
+def store_cached_transcript(cache_key, text):
+    """Remember a transcript in memory and on disk."""
+    store_in_memory_cache(cache_key, text)
+    try:
+        cache_dir.mkdir(parents=True, exist_ok=True)
+        (cache_dir / f"{cache_key}.txt").write_text(text)
+    except OSError as e:
+        logger.error("Error writing transcript cache: %s", e)
+
+
+def store_in_memory_cache(cache_key, text):
+    """Insert a transcript into the in-memory LRU, evicting the oldest entry."""
+    with transcript_cache_lock:
+        transcript_cache[cache_key] = text
+        transcript_cache.move_to_end(cache_key)
+        if len(transcript_cache) > TRANSCRIPT_CACHE_SIZE:
+            transcript_cache.popitem(last=False)
+
+
+def load_local_model():
+    """Load the local Whisper model in the background so startup is not delayed."""
+    def load():
+        global local_model
+        try:
+            logger.info("Loading local Whisper model '%s'...", LOCAL_MODEL_NAME)
+            local_model = WhisperModel(LOCAL_MODEL_NAME, device='cpu', compute_type='int8')
+            logger.info("Local Whisper model ready")
+        except Exception as e:
+            logger.error("Error loading local Whisper model: %s", e)
+    
+    if not LOCAL_WHISPER_AVAILABLE:
+        logger.info("faster-whisper not installed, all clips go to OpenAI")
         return
+    threading.Thread(target=load, daemon=True).start()
+
+
+def transcribe_locally(local_audio):
+    """Transcribe a short clip with the local model, returning None on failure."""
+    try:
+        segments, _ = local_model.transcribe(local_audio, language='en', beam_size=1)
+        return "".join(segment.text for segment in segments).strip()
+    except Exception as e:
+        logger.error("Local transcription error: %s", e)
+        return None
+
+
+def start_transcription_worker():
+    """Start the background asyncio loop that processes queued transcriptions."""
+    ready = threading.Event()
+    worker_thread = threading.Thread(
+        target=lambda: asyncio.run(transcription_worker(ready)),
+        daemon=True
+    )
+    worker_thread.start()
+    ready.wait()
+    logger.info("Transcription worker started")
+
+
+async def transcription_worker(ready):
+    """Pull queued audio buffers and transcribe them concurrently."""
+    global transcription_loop, transcription_queue
     
-    # Create a timestamp for the filename
-    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-    temp_dir = ensure_cache_dir()
-    temp_file = temp_dir / f"voice_recording_{timestamp}.wav"
+    transcription_loop = asyncio.get_running_loop()
+    transcription_queue = asyncio.Queue()
+    semaphore = asyncio.Semaphore(MAX_CONCURRENT_TRANSCRIPTIONS)
+    pending_tasks = set()
+    # Each job pastes only after the job queued before it has pasted
+    previous_pasted = asyncio.Event()
+    previous_pasted.set()
+    job_number = 0
+    ready.set()
     
+    if not OPENAI_LEGACY:
+        prewarm_task = asyncio.create_task(prewarm_connection())
+        pending_tasks.add(prewarm_task)
+        prewarm_task.add_done_callback(pending_tasks.discard)
+    
+    while True:
+        audio_buffers, cache_key, local_audio, cached_text = await transcription_queue.get()
+        job_number += 1
+        pasted = asyncio.Event()
+        task = asyncio.create_task(transcribe_audio_async(
+            job_number, audio_buffers, cache_key, local_audio, cached_text,
+            semaphore, previous_pasted, pasted
+        ))
+        previous_pasted = pasted
+        # Keep a reference so in-flight tasks are not garbage collected
+        pending_tasks.add(task)
+        task.add_done_callback(pending_tasks.discard)
+
+
+async def prewarm_connection():
+    """Open a connection to the API at startup."""
+    # This only saves the handshake for a first recording made before the
+    # server closes the idle connection; later recordings rely on keepalive
     try:
-        # Concatenate audio chunks and save to file
-        audio_concat = np.concatenate(audio_data, axis=0)
-        sf.write(temp_file, audio_concat, SAMPLE_RATE)
-        logger.info(f"Audio saved to: {temp_file}")
-        
-        # Transcribe audio using OpenAI API
-        transcribe_audio(temp_file)
-        
+        await http_client.head(str(client.base_url))
+        logger.info("Connection to OpenAI API established")
     except Exception as e:
-        logger.error(f"Error processing audio: {str(e)}")
-    finally:
-        # Cleanup even if transcription fails
-        if temp_file.exists():
-            try:
-                os.remove(temp_file)
-                logger.info(f"Temporary audio file deleted: {temp_file}")
-            except Exception as e:
-                logger.error(f"Error deleting temporary file: {str(e)}")
+        logger.warning("Could not prewarm OpenAI connection: %s", e)
 
 
-def transcribe_audio(audio_file):
-    """Transcribe audio using OpenAI's API and paste the result."""
+def transcribe_audio(audio_buffers, cache_key, local_audio=None, cached_text=None):
+    """Queue a recording's audio chunks for transcription and return immediately."""
+    if transcription_loop is None:
+        logger.error("Transcription worker is not running")
+        return
+    job = (audio_buffers, cache_key, local_audio, cached_text)
+    asyncio.run_coroutine_threadsafe(transcription_queue.put(job), transcription_loop)
+
+
+async def transcribe_audio_async(job_number, audio_buffers, cache_key, local_audio, cached_text,
+                                 semaphore, previous_pasted, pasted):
+    """Transcribe audio locally or with OpenAI's API and paste the result in queue order."""
     try:
-        logger.info("Sending audio to OpenAI for transcription...")
         transcribed_text = None
+        unpasted_text = ""
+        pasted_segments = False
         
-        # Open the audio file
-        with open(audio_file, "rb") as file:
-            if OPENAI_LEGACY:
-                # Handle legacy OpenAI API (v0.x)
-                try:
-                    response = openai.Audio.transcribe(
-                        model=TRANSCRIPTION_MODEL,
-                        file=file
-                    )
-                    transcribed_text = response.get("text", "")
-                except Exception as e:
-                    logger.error(f"OpenAI legacy API error: {str(e)}")
-            else:
-                # Handle modern OpenAI API (v1.x+)
-                try:
-                    response = client.audio.transcriptions.create(
-                        model=TRANSCRIPTION_MODEL,
-                        file=file
-                    )
-                    transcribed_text = response.text
-                except Exception as e:
-                    logger.error(f"OpenAI modern API error: {str(e)}")
+        if cached_text is not None:
+            # Cache hits skip transcription and only wait for their turn to paste
+            transcribed_text = cached_text
+            unpasted_text = cached_text
+            cache_key = None
+        elif local_audio is not None:
+            transcribed_text = await asyncio.to_thread(transcribe_locally, local_audio)
+            if transcribed_text:
+                logger.info("Transcribed short clip locally")
+                unpasted_text = transcribed_text
+        
+        if not transcribed_text and len(audio_buffers) > 1:
+            logger.info("Sending audio to OpenAI for transcription...")
+            # Each chunk takes its own semaphore slot; gather keeps results in order
+            chunk_texts = await asyncio.gather(
+                *(transcribe_chunk(audio_buffer, semaphore) for audio_buffer in audio_buffers)
+            )
+            transcribed_text = " ".join(text.strip() for text in chunk_texts if text)
+            unpasted_text = transcribed_text
+            if None in chunk_texts:
+                # Paste what was recognised, but do not cache an incomplete transcript
+                cache_key = None
+        elif not transcribed_text:
+            logger.info("Sending audio to OpenAI for transcription...")
+            async with semaphore:
+                if OPENAI_LEGACY:
+                    # Handle legacy OpenAI API (v0.x), which has no async client
+                    try:
+                        transcribed_text = await request_transcription(audio_buffers[0])
+                        unpasted_text = transcribed_text
+                    except Exception as e:
+                        logger.error("OpenAI legacy API error: %s", e)
+                else:
+                    # Handle modern OpenAI API (v1.x+), streaming so finished sentences
+                    # are pasted while the rest of the transcript is still arriving
+                    try:
+                        stream = await client.audio.transcriptions.create(
+                            model=TRANSCRIPTION_MODEL,
+                            file=audio_buffers[0],
+                            stream=True
+                        )
+                        received_parts = []
+                        async for event in stream:
+                            if event.type == "transcript.text.delta":
+                                received_parts.append(event.delta)
+                                unpasted_text += event.delta
+                                # Only paste early once every earlier recording has pasted
+                                if (previous_pasted.is_set()
+                                        and len(unpasted_text) >= STREAM_PASTE_MIN_CHARS
+                                        and unpasted_text.rstrip().endswith(SENTENCE_ENDINGS)):
+                                    copy_and_paste(unpasted_text)
+                                    unpasted_text = ""
+                                    pasted_segments = True
+                            elif event.type == "transcript.text.done":
+                                transcribed_text = event.text
+                        if transcribed_text is None:
+                            transcribed_text = "".join(received_parts)
+                    except Exception as e:
+                        logger.error("OpenAI modern API error: %s", e)
         
         if transcribed_text:
-            logger.info(f"Transcription received: {transcribed_text[:50]}...")
-            
-            # Copy to clipboard
-            pyperclip.copy(transcribed_text)
-            
-            # Programmatically paste with Cmd+V
-            paste_text()
+            logger.info("Transcription #%d received: %s...", job_number, transcribed_text[:50])
+            if cache_key is not None:
+                store_cached_transcript(cache_key, transcribed_text)
         else:
             logger.warning("Received empty transcription from OpenAI")
+        
+        # Paste whatever has not been pasted yet, including text received before an error
+        await previous_pasted.wait()
+        if unpasted_text:
+            copy_and_paste(unpasted_text)
+        # Leave the whole transcript on the clipboard rather than its last segment
+        if pasted_segments and transcribed_text:
+            paste_pool.submit(pyperclip.copy, transcribed_text)
     
     except Exception as e:
-        logger.error(f"Transcription error: {str(e)}")
+        logger.error("Transcription error: %s", e)
+    finally:
+        # Release the next job even if this one failed, but never ahead of earlier ones
+        await previous_pasted.wait()
+        pasted.set()
+
+
+async def transcribe_chunk(audio_buffer, semaphore):
+    """Transcribe one chunk of a long recording, returning None on failure."""
+    async with semaphore:
+        try:
+            return await request_transcription(audio_buffer)
+        except Exception as e:
+            logger.error("OpenAI API error on chunk: %s", e)
+            return None
+
+
+async def request_transcription(audio_buffer):
+    """Send one audio buffer to OpenAI and return the full transcript text."""
+    if OPENAI_LEGACY:
+        response = await asyncio.to_thread(
+            openai.Audio.transcribe,
+            model=TRANSCRIPTION_MODEL,
+            file=audio_buffer
+        )
+        return response.get("text", "")
+    
+    response = await client.audio.transcriptions.create(
+        model=TRANSCRIPTION_MODEL,
+        file=audio_buffer
+    )
+    return response.text
+
+
+def copy_and_paste(text):
+    """Queue text to be copied to the clipboard and pasted at the cursor."""
+    paste_pool.submit(paste_transcript, text)
+
+
+def paste_transcript(text):
+    """Copy text to the clipboard and paste it at the cursor."""
+    try:
+        # Copy to clipboard
+        pyperclip.copy(text)
+        
+        # Programmatically paste with Cmd+V
+        paste_text()
+        time.sleep(PASTE_SETTLE_SECONDS)
+    except Exception as e:
+        logger.error("Error pasting transcript: %s", e)
 
 
 def paste_text():
     """Programmatically trigger Cmd+V to paste the clipboard contents."""
+    if QUARTZ_AVAILABLE:
+        # Post the key events directly instead of spawning an AppleScript process
+        for key_down in (True, False):
+            event = CGEventCreateKeyboardEvent(None, V_KEY_VIRTUAL_CODE, key_down)
+            CGEventSetFlags(event, kCGEventFlagMaskCommand)
+            CGEventPost(kCGHIDEventTap, event)
+        logger.info("Text pasted successfully")
+        return
+    
     try:
         # For macOS, we can use AppleScript to simulate Cmd+V
         cmd = ['osascript', '-e', 'tell application "System Events" to keystroke "v" using command down']
@@ -229,101 +688,71 @@ def paste_text():
         logger.info("Text pasted successfully")
     
     except subprocess.CalledProcessError as e:
-        logger.error(f"Error pasting text: {e}")
+        logger.error("Error pasting text: %s", e)
 
 
 def is_v_key(key):
     """Check if a key is the 'v' key, including different representations."""
-    try:
-        # Check for direct character match (v or V)
-        if hasattr(key, 'char') and key.char and key.char.lower() == 'v':
-            return True
-        
-        # Check for special symbols that might be v on some keyboard layouts (√, ◊, etc.)
-        if hasattr(key, 'char') and key.char in ['√', '◊', 'v', 'V']:
-            return True
-        
-        # Check for vk code on some systems
-        if hasattr(key, 'vk') and key.vk == 86:  # 86 is the virtual key code for 'v'
-            return True
-            
-        # Check KeyCode directly
-        if key == keyboard.KeyCode.from_char('v') or key == keyboard.KeyCode.from_char('V'):
-            return True
-    except:
-        pass
-    
-    return False
+    # Direct character match, the symbols Option + V produces on some layouts (√, ◊),
+    # the macOS or other-system vk codes, or the cached KeyCode objects
+    return (getattr(key, 'char', None) in V_CHARS
+            or getattr(key, 'vk', None) in (V_KEY_VIRTUAL_CODE, 86)  # 86 is 'v' on some systems
+            or key in V_KEYCODES)
+
+
+def hotkey_key(key):
+    """Return the key as the hotkey state machine should see it."""
+    # With Option held macOS reports the Option-layer character (√), which
+    # canonical() alone would never match against the parsed 'v'
+    if is_v_key(key):
+        key = V_KEYCODES[0]
+    return keyboard_listener.canonical(key)
 
 
 def on_key_press(key):
-    """Handle key press event."""
-    global recording, recording_thread
-    
-    # Check if Option + Command + V is pressed (macOS)
-    try:
-        cmd_keys = [keyboard.Key.cmd, keyboard.Key.cmd_l, keyboard.Key.cmd_r]
-        alt_keys = [keyboard.Key.alt, keyboard.Key.alt_l, keyboard.Key.alt_r]
-        
-        if (key in cmd_keys and any(k in alt_keys for k in currently_pressed_keys) and 
-            any(is_v_key(k) for k in currently_pressed_keys)):
-            start_recording()
-        elif (key in alt_keys and any(k in cmd_keys for k in currently_pressed_keys) and 
-              any(is_v_key(k) for k in currently_pressed_keys)):
-            start_recording()
-        elif (is_v_key(key) and any(k in cmd_keys for k in currently_pressed_keys) and 
-              any(k in alt_keys for k in currently_pressed_keys)):
-            start_recording()
-    except:
-        pass
-    
-    # Add key to currently pressed keys
-    currently_pressed_keys.add(key)
+    """Feed key presses to the hotkey."""
+    hotkey.press(hotkey_key(key))
 
 
 def on_key_release(key):
-    """Handle key release event."""
-    global recording
-    
-    # Remove key from currently pressed keys
-    try:
-        currently_pressed_keys.remove(key)
-    except KeyError:
-        pass
-    
-    # Check if any part of the hotkey is released while recording
-    try:
-        cmd_keys = [keyboard.Key.cmd, keyboard.Key.cmd_l, keyboard.Key.cmd_r]
-        alt_keys = [keyboard.Key.alt, keyboard.Key.alt_l, keyboard.Key.alt_r]
-        
-        if recording and (key in cmd_keys or key in alt_keys or is_v_key(key)):
-            recording = False
-    except:
-        pass
+    """Update the hotkey and stop recording if any part of it is released."""
+    hotkey.release(hotkey_key(key))
+    # Set membership and is_v_key's getattr lookups cannot raise, so no handler is needed
+    if recording and (key in HOTKEY_MODIFIERS or is_v_key(key)):
+        stop_event.set()
 
 
 def start_recording():
     """Start recording if not already recording."""
-    global recording, recording_thread
+    global recording, recording_thread, active_capture
     
-    if not recording:
+    # Take the stream lock so a recording never starts while the stream is being reopened
+    with audio_stream_lock:
+        if recording:
+            return
+        # Switch buffers with a fresh position before enabling capture so the callback starts at the head
+        previous_buffer = active_capture[0]
+        buffer = pcm_buffers[1] if previous_buffer is pcm_buffers[0] else pcm_buffers[0]
+        capture = (buffer, [0])
+        active_capture = capture
         recording = True
-        logger.info("Hotkey combination detected, starting recording")
-        recording_thread = threading.Thread(target=record_audio)
-        recording_thread.daemon = True
-        recording_thread.start()
+        stop_event.clear()
+    
+    logger.info("Hotkey combination detected, starting recording")
+    recording_thread = threading.Thread(target=record_audio, args=(capture,))
+    recording_thread.daemon = True
+    recording_thread.start()
 
 
 def request_permissions():
     """Request necessary permissions on first run."""
-    # Request microphone permission by attempting a quick audio capture
+    # Request microphone permission by opening the stream used for all recordings
     try:
         logger.info("Requesting microphone permission...")
-        with sd.InputStream(samplerate=SAMPLE_RATE, channels=1, blocksize=1024):
-            time.sleep(0.1)
+        open_audio_stream()
         logger.info("Microphone permission granted")
     except Exception as e:
-        logger.error(f"Error accessing microphone: {str(e)}")
+        logger.error("Error accessing microphone: %s", e)
         print("\n⚠️  Please grant microphone permission in System Settings\n")
     
     # For Accessibility permissions, we can only inform the user
@@ -336,6 +765,8 @@ def handle_exit(signum, frame):
     """Clean up on exit."""
     logger.info("Exiting voice-paste...")
     keyboard_listener.stop()
+    if audio_stream is not None:
+        audio_stream.close()
     sys.exit(0)
 
 
@@ -345,18 +776,25 @@ if __name__ == "__main__":
     print("Release to transcribe and paste")
     print("Press Ctrl+C to quit")
     
-    # Set up global key tracking
-    currently_pressed_keys = set()
-    
     # Request permissions on first run
     request_permissions()
     
+    # Trim the on-disk transcript cache
+    prune_transcript_cache()
+    
+    # Load the optional local model for short clips
+    load_local_model()
+    
+    # Start the background transcription worker
+    start_transcription_worker()
+    
     # Set up signal handlers for clean exit
     signal.signal(signal.SIGINT, handle_exit)
     signal.signal(signal.SIGTERM, handle_exit)
     
-    # Set up key listeners for press and release
+    # Set up the hotkey and a key listener for press and release
     logger.info("Initializing keyboard listener")
+    hotkey = keyboard.HotKey(keyboard.HotKey.parse(HOTKEY), start_recording)
     keyboard_listener = keyboard.Listener(
         on_press=on_key_press,
         on_release=on_key_release
@@ -370,6 +808,6 @@ if __name__ == "__main__":
     except KeyboardInterrupt:
         print("\nExiting...")
     except Exception as e:
-        logger.error(f"Unexpected error: {e}")
+        logger.error("Unexpected error: %s", e)
     finally:
         keyboard_listener.stop()